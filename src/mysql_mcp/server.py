@@ -1,17 +1,57 @@
 """Modern MySQL MCP Server using FastMCP."""
 
 import argparse
+import asyncio
+import csv
+import io
+import logging
 import os
 import re
 import sys
+import threading
+import time
+from collections.abc import Callable, Mapping
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any
 
 from fastmcp import FastMCP
-from mysql.connector import Error, connect
+from mysql.connector import HAVE_CEXT, Error, connect
+from mysql.connector.pooling import CNX_POOL_MAXSIZE, MySQLConnectionPool
 
-# Global configuration
-_db_config: dict[str, Any] | None = None
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 8
+FETCH_BATCH_SIZE = 1000
+DEFAULT_SCHEMA_CACHE_TTL = 60
+SCHEMA_CACHE_MAXSIZE = 512
+UNEXPECTED_ERROR_MESSAGE = "Unexpected error (see server logs for details)"
+
+# IS_NULLABLE mapped to the nullability shown in descriptions
+_NULL_MAP = {"YES": "NULL", "NO": "NOT NULL"}
+
+# Valid MySQL identifier: letters, numbers, underscores and dollar signs,
+# not starting with a number
+_TABLE_NAME_RE = re.compile(r"\A[a-zA-Z_$][a-zA-Z0-9_$]*\Z")
+
+# Global configuration, built once at startup and read-only afterwards
+_db_config: Mapping[str, Any] | None = None
+_pool_size: int = DEFAULT_POOL_SIZE
+_max_rows: int = 0
+_schema_cache_ttl: int = DEFAULT_SCHEMA_CACHE_TTL
+
+# Shared connection pool, created lazily on first use
+_pool: MySQLConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+# Limits concurrent database calls to the pool size, created lazily on first use
+_db_semaphore: asyncio.Semaphore | None = None
+
+# Schema resource responses keyed by resource URI: (expiry time, text)
+_schema_cache: dict[str, tuple[float, str]] = {}
+_schema_cache_lock = threading.Lock()
+# Bumped on every clear so queries that started before it don't store stale text
+_schema_cache_generation = 0
 
 
 def validate_ssl_file(filepath: str, arg_name: str) -> str:
@@ -41,6 +81,45 @@ def ssl_cert_file(value: str) -> str:
     return validate_ssl_file(value, "SSL certificate")
 
 
+def validate_int_range(
+    value: str, arg_name: str, minimum: int, maximum: int | None = None
+) -> int:
+    """Validate that an integer argument lies within the given bounds."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"{arg_name}: '{value}' is not an integer"
+        ) from None
+
+    if number < minimum or (maximum is not None and number > maximum):
+        bounds = (
+            f"between {minimum} and {maximum}"
+            if maximum is not None
+            else f"{minimum} or greater"
+        )
+        raise argparse.ArgumentTypeError(
+            f"{arg_name}: must be {bounds}, got {number}"
+        )
+
+    return number
+
+
+def pool_size(value: str) -> int:
+    """Custom type for connection pool size validation."""
+    return validate_int_range(value, "Pool size", 1, CNX_POOL_MAXSIZE)
+
+
+def max_rows(value: str) -> int:
+    """Custom type for result row limit validation (0 means unlimited)."""
+    return validate_int_range(value, "Max rows", 0)
+
+
+def cache_ttl(value: str) -> int:
+    """Custom type for schema cache TTL validation (0 disables the cache)."""
+    return validate_int_range(value, "Schema cache TTL", 0)
+
+
 def create_parser() -> argparse.ArgumentParser:
     """Create argument parser for MySQL MCP server."""
     parser = argparse.ArgumentParser(
@@ -100,6 +179,29 @@ Examples:
     advanced_group.add_argument('--sql-mode',
                                default='TRADITIONAL',
                                help='SQL mode (default: %(default)s)')
+    advanced_group.add_argument('--compress',
+                               action='store_true',
+                               help='Enable zlib compression of the client/server '
+                                    'protocol, useful for remote servers')
+    advanced_group.add_argument('--use-pure',
+                               action='store_true',
+                               help='Use the pure Python protocol implementation '
+                                    'instead of the C extension')
+    advanced_group.add_argument('--pool-size',
+                               type=pool_size,
+                               default=DEFAULT_POOL_SIZE,
+                               help='Connection pool size (default: %(default)s)')
+    advanced_group.add_argument('--max-rows',
+                               type=max_rows,
+                               default=0,
+                               help='Maximum rows returned by execute_sql, '
+                                    '0 for unlimited (default: %(default)s)')
+    advanced_group.add_argument('--schema-cache-ttl',
+                               type=cache_ttl,
+                               default=DEFAULT_SCHEMA_CACHE_TTL,
+                               help='Seconds to cache table listings and '
+                                    'descriptions, 0 to disable '
+                                    '(default: %(default)s)')
 
     return parser
 
@@ -128,6 +230,9 @@ def validate_ssl_configuration(args: argparse.Namespace) -> None:
 
 def create_db_config(args: argparse.Namespace) -> dict[str, Any]:
     """Create database configuration from parsed arguments."""
+    # charset/collation are always set: Connector/Python issues SET NAMES after
+    # every connect and session reset even when they are omitted, so leaving
+    # them to the server default would only change collation, not save a trip
     config = {
         "host": args.host,
         "port": args.port,
@@ -138,6 +243,10 @@ def create_db_config(args: argparse.Namespace) -> dict[str, Any]:
         "collation": args.collation,
         "autocommit": True,
         "sql_mode": args.sql_mode,
+        # Connector/Python raises if use_pure=False is passed without the C
+        # extension, so only ask for it when it is installed
+        "use_pure": args.use_pure or not HAVE_CEXT,
+        "compress": args.compress,
     }
 
     # Add SSL configuration if not disabled
@@ -152,13 +261,128 @@ def create_db_config(args: argparse.Namespace) -> dict[str, Any]:
     return config
 
 
-def get_db_config() -> dict[str, Any]:
-    """Get database configuration."""
+def get_db_config() -> Mapping[str, Any]:
+    """Get database configuration.
+
+    The configuration is built once from the command line in main() and
+    shared as a read-only mapping, so callers cannot mutate it underneath
+    the connection pool.
+    """
     if _db_config is None:
         raise RuntimeError("Database configuration not initialized. Call main() first.")
     return _db_config
 
 
+def get_pool() -> MySQLConnectionPool:
+    """Get the shared connection pool, creating it on first use.
+
+    main() creates the pool at startup, which opens and authenticates all of
+    its connections up front. Connections are checked out with
+    ``get_pool().get_connection()`` and returned to the pool when the
+    connection context manager exits, so each call reuses an authenticated
+    connection instead of opening a new one.
+    """
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Session reset keeps SET statements and temporary tables run
+                # through execute_sql from leaking between requests. It also
+                # deallocates server-side prepared statements, so those cannot
+                # be cached across tool calls.
+                _pool = MySQLConnectionPool(
+                    pool_name="mysql_mcp",
+                    pool_size=_pool_size,
+                    pool_reset_session=True,
+                    **get_db_config(),
+                )
+    return _pool
+
+
+async def run_in_db_thread[**P](
+    func: Callable[P, str], *args: P.args, **kwargs: P.kwargs
+) -> str:
+    """Run blocking database work in a worker thread.
+
+    Keeps the event loop free to serve other requests while MySQL responds.
+    At most pool_size calls run at once, so a checkout never finds the pool
+    exhausted. A slot is held until the worker thread finishes, even if the
+    awaiting request is cancelled, since the thread keeps its connection
+    until then.
+    """
+    global _db_semaphore
+
+    if _db_semaphore is None:
+        _db_semaphore = asyncio.Semaphore(_pool_size)
+
+    semaphore = _db_semaphore
+    await semaphore.acquire()
+    try:
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    except BaseException:
+        semaphore.release()
+        raise
+    task.add_done_callback(lambda _: semaphore.release())
+    return await asyncio.shield(task)
+
+
+def get_cached_schema(key: str) -> str | None:
+    """Get a cached schema resource response if it has not expired.
+
+    Args:
+        key: The resource URI the response was cached under
+
+    Returns:
+        The cached response, or None on a miss
+    """
+    with _schema_cache_lock:
+        entry = _schema_cache.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del _schema_cache[key]
+            return None
+        return value
+
+
+def get_schema_cache_generation() -> int:
+    """Return the current schema cache generation."""
+    with _schema_cache_lock:
+        return _schema_cache_generation
+
+
+def cache_schema(key: str, value: str, generation: int) -> None:
+    """Cache a schema resource response for the configured TTL.
+
+    Args:
+        key: Resource URI the response belongs to
+        value: Formatted response text
+        generation: Cache generation read before the query ran; the store is
+            skipped if the cache was cleared since then
+    """
+    if _schema_cache_ttl <= 0:
+        return
+
+    with _schema_cache_lock:
+        if generation != _schema_cache_generation:
+            return
+        if key not in _schema_cache and len(_schema_cache) >= SCHEMA_CACHE_MAXSIZE:
+            # Evict the oldest entry; dicts preserve insertion order
+            del _schema_cache[next(iter(_schema_cache))]
+        _schema_cache[key] = (time.monotonic() + _schema_cache_ttl, value)
+
+
+def clear_schema_cache() -> None:
+    """Drop all cached schema resource responses."""
+    global _schema_cache_generation
+    with _schema_cache_lock:
+        _schema_cache.clear()
+        _schema_cache_generation += 1
+
+
 def validate_table_name(table_name: str) -> bool:
     """Validate that a table name is safe to use in SQL queries.
 
@@ -174,11 +398,10 @@ def validate_table_name(table_name: str) -> bool:
         return False
 
     # Check for valid MySQL identifier pattern
-    pattern = r'^[a-zA-Z_$][a-zA-Z0-9_$]*$'
-    return bool(re.match(pattern, table_name))
+    return _TABLE_NAME_RE.match(table_name) is not None
 
 
-def table_exists(table_name: str, config: dict[str, Any]) -> bool:
+def table_exists(table_name: str, config: Mapping[str, Any]) -> bool:
     """Check if a table exists in the database.
 
     Args:
@@ -191,8 +414,14 @@ def table_exists(table_name: str, config: dict[str, Any]) -> bool:
     try:
         with connect(**config) as conn:
             with conn.cursor() as cursor:
-                cursor.execute("SHOW TABLES LIKE %s", (table_name,))
-                return cursor.fetchone() is not None
+                # Exact match on a bound parameter; SHOW TABLES LIKE would
+                # treat "_" and "%" in the name as wildcards
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                    (table_name,),
+                )
+                return bool(cursor.fetchall())
     except Error:
         return False
 
@@ -226,24 +455,19 @@ mcp = FastMCP(
     - --charset: Character set (default: utf8mb4)
     - --collation: Collation (default: utf8mb4_unicode_ci)
     - --sql-mode: SQL mode (default: TRADITIONAL)
+    - --compress: Enable zlib protocol compression
+    - --use-pure: Use the pure Python protocol instead of the C extension
+    - --pool-size: Connection pool size (default: 8)
+    - --max-rows: Maximum rows returned by execute_sql (default: 0, unlimited)
+    - --schema-cache-ttl: Seconds to cache table resources (default: 60)
     """,
 )
 
 
-@mcp.tool
-def execute_sql(query: str) -> str:
-    """Execute an SQL query on the MySQL server.
-
-Args:
-        query: The SQL query to execute
-
-Returns:
-        Query results as formatted text or success message for non-SELECT queries
-    """
-    config = get_db_config()
-
+def run_sql(query: str) -> str:
+    """Execute an SQL query on a pooled connection and format the result."""
     try:
-        with connect(**config) as conn:
+        with get_pool().get_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(query)
 
@@ -251,122 +475,186 @@ Returns:
                 if cursor.description:
                     # Query returns results (SELECT, SHOW, DESCRIBE, etc.)
                     columns = [desc[0] for desc in cursor.description]
-                    rows = cursor.fetchall()
 
-                    if not rows:
+                    # Format as CSV, quoting values with delimiters or newlines
+                    output = io.StringIO()
+                    writer = csv.writer(output, lineterminator="\n")
+                    writer.writerow(columns)
+
+                    # Stream rows in batches instead of materializing them all
+                    row_count = 0
+                    truncated = False
+                    while batch := cursor.fetchmany(FETCH_BATCH_SIZE):
+                        if _max_rows and row_count + len(batch) > _max_rows:
+                            writer.writerows(batch[:_max_rows - row_count])
+                            row_count = _max_rows
+                            truncated = True
+                            # Discard the rest of the result set unread
+                            conn.consume_results()
+                            break
+                        writer.writerows(batch)
+                        row_count += len(batch)
+
+                    if not row_count:
                         return "Query executed successfully. No results returned."
 
-                    # Format as CSV-like output
-                    result_lines = [",".join(columns)]
-                    result_lines.extend([",".join(map(str, row)) for row in rows])
+                    if truncated:
+                        output.write(f"... truncated to {_max_rows} rows\n")
 
-                    return "\n".join(result_lines)
+                    return output.getvalue()
                 else:
                     # Non-SELECT query (INSERT, UPDATE, DELETE, etc.)
                     conn.commit()
+                    # Table lists, structure and row counts may have changed
+                    clear_schema_cache()
                     return (
                         f"Query executed successfully. "
                         f"{cursor.rowcount} rows affected."
                     )
 
     except Error as e:
-        return f"MySQL error: {str(e)}"
-    except Exception as e:
-        return f"Unexpected error: {str(e)}"
+        # The MySQL message goes back to the client so the query can be fixed
+        logger.warning("MySQL error in execute_sql: %s", e)
+        return f"MySQL error: {e}"
+    except Exception:
+        logger.exception("Unexpected error in execute_sql")
+        return UNEXPECTED_ERROR_MESSAGE
+
+
+# Results are returned as text content only; a structured output schema would
+# make FastMCP serialize the whole result a second time into structuredContent
+@mcp.tool(output_schema=None)
+async def execute_sql(query: str) -> str:
+    """Execute an SQL query on the MySQL server.
 
+Args:
+        query: The SQL query to execute
+
+Returns:
+        Query results as formatted text or success message for non-SELECT queries
+    """
+    return await run_in_db_thread(run_sql, query)
 
-@mcp.resource("mysql://tables")
-def list_tables() -> str:
-    """List all available tables in the database."""
-    config = get_db_config()
 
+def fetch_table_list() -> str:
+    """Query and format the list of tables in the database."""
+    generation = get_schema_cache_generation()
     try:
-        with connect(**config) as conn:
+        with get_pool().get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("SHOW TABLES")
+                # Let the server build the "- name" lines in a stable order
+                cursor.execute(
+                    "SELECT CONCAT('- ', TABLE_NAME) FROM information_schema.TABLES "
+                    "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME"
+                )
                 tables = cursor.fetchall()
 
                 if not tables:
                     return "No tables found in the database."
 
-                table_list = []
-                for table in tables:
-                    if table and len(table) > 0:
-                        # table is a sequence/tuple from MySQL cursor
-                        table_name = str(table[0])  # type: ignore[index]
-                        table_list.append(f"- {table_name}")
-                return "Available tables:\n" + "\n".join(table_list)
+                result = "Available tables:\n" + "\n".join(row[0] for row in tables)
+                cache_schema("mysql://tables", result, generation)
+                return result
 
     except Error as e:
-        return f"MySQL error: {str(e)}"
-    except Exception as e:
-        return f"Unexpected error: {str(e)}"
+        logger.warning("MySQL error in list_tables: %s", e)
+        return f"MySQL error: {e}"
+    except Exception:
+        logger.exception("Unexpected error in list_tables")
+        return UNEXPECTED_ERROR_MESSAGE
 
 
-@mcp.resource("mysql://tables/{table}")
-def describe_table(table: str) -> str:
-    """Get detailed information about a specific table.
-
-Args:
-        table: The name of the table to describe
+@mcp.resource("mysql://tables")
+async def list_tables() -> str:
+    """List all available tables in the database."""
+    if (cached := get_cached_schema("mysql://tables")) is not None:
+        return cached
 
-Returns:
-        Table structure and information
-    """
-    # Validate table name to prevent SQL injection
-    if not validate_table_name(table):
-        return (
-            f"Invalid table name: '{table}'. Table names must contain only "
-            "letters, numbers, underscores, and dollar signs."
-        )
+    return await run_in_db_thread(fetch_table_list)
 
-    config = get_db_config()
 
-    # Check if table exists before proceeding
-    if not table_exists(table, config):
-        return f"Table '{table}' not found in the database."
+def fetch_table_description(table: str) -> str:
+    """Query and format the structure of an already validated table.
 
+    Columns and the row count come from one information_schema query. The
+    row count is InnoDB's estimate (TABLE_ROWS), which avoids a full COUNT(*)
+    scan but can be off, and MySQL 8 may cache it for a while.
+    """
+    generation = get_schema_cache_generation()
     try:
-        with connect(**config) as conn:
+        with get_pool().get_connection() as conn:
             with conn.cursor() as cursor:
-                # Get table structure - now safe since we validated the table name
-                cursor.execute(f"DESCRIBE `{table}`")  # nosec B608
+                cursor.execute(
+                    "SELECT c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE, "
+                    "c.COLUMN_KEY, c.COLUMN_DEFAULT, c.EXTRA, t.TABLE_ROWS "
+                    "FROM information_schema.COLUMNS c "
+                    "JOIN information_schema.TABLES t "
+                    "USING (TABLE_SCHEMA, TABLE_NAME) "
+                    "WHERE c.TABLE_SCHEMA = DATABASE() AND c.TABLE_NAME = %s "
+                    "ORDER BY c.ORDINAL_POSITION",
+                    (table,),
+                )
                 columns = cursor.fetchall()
 
                 if not columns:
-                    return f"Table '{table}' not found or has no columns."
+                    return f"Table '{table}' not found in the database."
 
                 # Format table structure
-                result = [f"Table: {table}", "=" * 50, ""]
-                result.append("Columns:")
+                result = [f"Table: {table}", "=" * 50, "", "Columns:"]
 
-                for col in columns:
-                    field, type_, null, key, default, extra = col
-                    null_str = "NULL" if null == "YES" else "NOT NULL"
+                for field, type_, null, key, default, extra, _ in columns:
                     key_str = f" ({key!s})" if key else ""
                     default_str = f" DEFAULT {default!s}" if default is not None else ""
                     extra_str = f" {extra!s}" if extra else ""
+                    result.append(
+                        f"  - {field!s}: {type_!s} "
+                        f"{_NULL_MAP.get(null, 'NOT NULL')}"
+                        f"{key_str}{default_str}{extra_str}"
+                    )
 
-                    col_info = f"{null_str}{key_str}{default_str}{extra_str}"
-                    result.append(f"  - {field!s}: {type_!s} {col_info}")
-
-                # Get row count - now safe since we validated the table name
-                cursor.execute(f"SELECT COUNT(*) FROM `{table}`")  # nosec B608
-                count_result = cursor.fetchone()
-                row_count = count_result[0] if count_result else 0  # type: ignore
-                result.extend(["", f"Total rows: {row_count!s}"])
+                # TABLE_ROWS is the same on every row, and NULL for views
+                row_count = columns[0][6]
+                row_count_str = "unknown" if row_count is None else str(row_count)
+                result.extend(["", f"Approximate rows: {row_count_str}"])
 
-                return "\n".join(result)
+                description = "\n".join(result)
+                cache_schema(f"mysql://tables/{table}", description, generation)
+                return description
 
     except Error as e:
-        return f"MySQL error: {str(e)}"
-    except Exception as e:
-        return f"Unexpected error: {str(e)}"
+        logger.warning("MySQL error in describe_table: %s", e)
+        return f"MySQL error: {e}"
+    except Exception:
+        logger.exception("Unexpected error in describe_table")
+        return UNEXPECTED_ERROR_MESSAGE
+
+
+@mcp.resource("mysql://tables/{table}")
+async def describe_table(table: str) -> str:
+    """Get detailed information about a specific table.
+
+Args:
+        table: The name of the table to describe
+
+Returns:
+        Table structure and information
+    """
+    # Validate table name to prevent SQL injection
+    if not validate_table_name(table):
+        return (
+            f"Invalid table name: '{table}'. Table names must contain only "
+            "letters, numbers, underscores, and dollar signs."
+        )
+
+    if (cached := get_cached_schema(f"mysql://tables/{table}")) is not None:
+        return cached
+
+    return await run_in_db_thread(fetch_table_description, table)
 
 
 def main() -> None:
     """Main entry point for running the MCP server."""
-    global _db_config
+    global _db_config, _pool_size, _max_rows, _schema_cache_ttl
 
     try:
         # Parse command line arguments
@@ -377,22 +665,35 @@ def main() -> None:
         validate_ssl_configuration(args)
 
         # Create database configuration
-        _db_config = create_db_config(args)
-
-        # Test database connection on startup
-        with connect(**_db_config) as conn:
+        _db_config = MappingProxyType(create_db_config(args))
+        _pool_size = args.pool_size
+        _max_rows = args.max_rows
+        _schema_cache_ttl = args.schema_cache_ttl
+
+        # Create the connection pool, which opens all pool_size connections,
+        # and test it on startup so the first request gets a ready connection
+        with get_pool().get_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("SELECT VERSION()")
                 version_result = cursor.fetchone()
-                version = version_result[0] if version_result else "Unknown"  # type: ignore
+                version = version_result[0] if version_result else "Unknown"
                 print(f"Connected to MySQL {version!s}", flush=True)
 
+                # Show which protocol implementation decodes result rows
+                if HAVE_CEXT and not args.use_pure:
+                    print("Using MySQL Connector/Python C extension", flush=True)
+                else:
+                    print(
+                        "Using pure Python MySQL protocol implementation",
+                        flush=True
+                    )
+
                 # Show SSL status
                 cursor.execute("SHOW STATUS LIKE 'Ssl_cipher'")
                 ssl_result = cursor.fetchone()
                 if ssl_result and len(ssl_result) > 1:
                     # ssl_result is a tuple from MySQL cursor
-                    cipher_value = ssl_result[1]  # type: ignore[index]
+                    cipher_value = ssl_result[1]
                     if cipher_value:
                         cipher = str(cipher_value)
                         print(
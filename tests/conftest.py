@@ -7,7 +7,9 @@ from unittest.mock import MagicMock, patch
 import pytest
 from fastmcp import Client
 
-from mysql_mcp.server import mcp
+import mysql_mcp.server as server_module
+from mysql_mcp import create_db_config, create_parser
+from mysql_mcp.server import clear_schema_cache, mcp
 
 
 @pytest.fixture
@@ -26,17 +28,38 @@ def mock_env_vars() -> Generator[None]:
 
 
 @pytest.fixture
-def mock_mysql_connection():
-    """Mock MySQL connection and cursor."""
+def db_config() -> Generator[None]:
+    """Initialize the server database configuration for a single test."""
+    args = create_parser().parse_args([
+        "--user", "test_user",
+        "--password", "test_password",
+        "--database", "test_db"
+    ])
+    clear_schema_cache()
+    with patch.object(server_module, "_db_config", create_db_config(args)):
+        yield
+    clear_schema_cache()
+
+
+@pytest.fixture
+def mock_pool() -> Generator[MagicMock]:
+    """Mock the shared MySQL connection pool."""
+    with patch("mysql_mcp.server.get_pool") as mock_get_pool:
+        yield mock_get_pool.return_value
+
+
+@pytest.fixture
+def mock_mysql_connection(mock_pool):
+    """Mock a pooled MySQL connection and cursor."""
     mock_cursor = MagicMock()
     mock_connection = MagicMock()
     mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
     mock_connection.cursor.return_value.__exit__.return_value = None
 
-    with patch("mysql_mcp.server.connect") as mock_connect:
-        mock_connect.return_value.__enter__.return_value = mock_connection
-        mock_connect.return_value.__exit__.return_value = None
-        yield mock_connection, mock_cursor
+    pooled_connection = mock_pool.get_connection.return_value
+    pooled_connection.__enter__.return_value = mock_connection
+    pooled_connection.__exit__.return_value = None
+    return mock_connection, mock_cursor
 
 
 @pytest.fixture
@@ -1,26 +1,23 @@
 """Tests for MySQL MCP Server."""
 
-from unittest.mock import MagicMock, patch
+import asyncio
+import threading
+from unittest.mock import patch
 
+import mysql.connector.pooling
 import pytest
 from fastmcp import Client
 from mcp.types import TextResourceContents
 from mysql.connector import Error
 
 import mysql_mcp.server as server_module
-from mysql_mcp import create_db_config, create_parser
-from mysql_mcp.server import get_db_config, mcp
-
-
-def setup_test_db_config():
-    """Helper function to set up database configuration for testing."""
-    parser = create_parser()
-    args = parser.parse_args([
-        "--user", "test_user",
-        "--password", "test_password",
-        "--database", "test_db"
-    ])
-    server_module._db_config = create_db_config(args)
+from mysql_mcp import (
+    create_db_config,
+    create_parser,
+    table_exists,
+    validate_table_name,
+)
+from mysql_mcp.server import get_db_config, get_pool, mcp
 
 
 class TestDatabaseConfiguration:
@@ -82,10 +79,59 @@ class TestDatabaseConfiguration:
             "--database", "test_db"
         ])
 
-        config = create_db_config(args)
+        with patch("mysql_mcp.server.HAVE_CEXT", True):
+            config = create_db_config(args)
         assert config["host"] == "localhost"
         assert config["port"] == 3306
         assert config["charset"] == "utf8mb4"
+        assert config["use_pure"] is False
+        assert config["compress"] is False
+
+    def test_create_db_config_use_pure(self):
+        """Test opting into the pure Python protocol implementation."""
+        parser = create_parser()
+        args = parser.parse_args([
+            "--user", "test_user",
+            "--password", "test_password",
+            "--database", "test_db",
+            "--use-pure"
+        ])
+
+        config = create_db_config(args)
+        assert config["use_pure"] is True
+
+    def test_create_db_config_without_c_extension(self):
+        """Test falling back to pure Python when the C extension is missing."""
+        parser = create_parser()
+        args = parser.parse_args([
+            "--user", "test_user",
+            "--password", "test_password",
+            "--database", "test_db"
+        ])
+
+        with (
+            patch("mysql_mcp.server.HAVE_CEXT", False),
+            patch("mysql.connector.pooling.CMySQLConnection", None),
+            patch("mysql.connector.pooling.MySQLConnection") as mock_connection,
+        ):
+            config = create_db_config(args)
+            conn = mysql.connector.pooling.connect(**config)
+
+        assert config["use_pure"] is True
+        assert conn is mock_connection.return_value
+
+    def test_create_db_config_compress(self):
+        """Test enabling protocol compression."""
+        parser = create_parser()
+        args = parser.parse_args([
+            "--user", "test_user",
+            "--password", "test_password",
+            "--database", "test_db",
+            "--compress"
+        ])
+
+        config = create_db_config(args)
+        assert config["compress"] is True
 
     def test_get_db_config_not_initialized(self):
         """Test that get_db_config raises error when not initialized."""
@@ -94,6 +140,133 @@ class TestDatabaseConfiguration:
         ):
             get_db_config()
 
+    def test_create_parser_pool_size(self):
+        """Test pool size argument parsing and validation."""
+        parser = create_parser()
+        required = [
+            "--user", "test_user",
+            "--password", "test_password",
+            "--database", "test_db"
+        ]
+
+        assert parser.parse_args(required).pool_size == 8
+        assert parser.parse_args([*required, "--pool-size", "4"]).pool_size == 4
+
+        with pytest.raises(SystemExit):
+            parser.parse_args([*required, "--pool-size", "0"])
+
+    @pytest.mark.parametrize("option", ["--max-rows", "--schema-cache-ttl"])
+    def test_create_parser_rejects_negative_limits(self, option):
+        """Test that row limit and cache TTL accept 0 but reject negatives."""
+        parser = create_parser()
+        required = [
+            "--user", "test_user",
+            "--password", "test_password",
+            "--database", "test_db"
+        ]
+
+        args = parser.parse_args([*required, option, "0"])
+        assert getattr(args, option[2:].replace("-", "_")) == 0
+
+        with pytest.raises(SystemExit):
+            parser.parse_args([*required, option, "-1"])
+        with pytest.raises(SystemExit):
+            parser.parse_args([*required, option, "ten"])
+
+    @patch("mysql_mcp.server.MySQLConnectionPool")
+    def test_get_pool_created_once(self, mock_pool_class, db_config):
+        """Test that the connection pool is created lazily and reused."""
+        server_module._pool = None
+
+        try:
+            pool = get_pool()
+            assert get_pool() is pool
+            mock_pool_class.assert_called_once()
+            kwargs = mock_pool_class.call_args.kwargs
+            assert kwargs["pool_name"] == "mysql_mcp"
+            assert kwargs["pool_size"] == server_module._pool_size
+            assert kwargs["user"] == "test_user"
+        finally:
+            server_module._pool = None
+
+
+class TestStartup:
+    """Test server startup."""
+
+    @patch.object(server_module, "_schema_cache_ttl", 60)
+    @patch.object(server_module, "_max_rows", 0)
+    @patch.object(server_module, "_pool_size", 8)
+    @patch.object(server_module, "_db_config", None)
+    @patch.object(server_module.mcp, "run")
+    def test_main_warms_pool(self, mock_run, mock_pool, mock_mysql_connection):
+        """Test that main() creates the pool and checks it before serving."""
+        _, mock_cursor = mock_mysql_connection
+        mock_cursor.fetchone.side_effect = [("8.0.33",), ("Ssl_cipher", "")]
+
+        argv = [
+            "mysql-mcp",
+            "--user", "test_user",
+            "--password", "test_password",
+            "--database", "test_db",
+            "--pool-size", "4"
+        ]
+        with patch("sys.argv", argv):
+            server_module.main()
+
+        assert server_module._pool_size == 4
+        mock_pool.get_connection.assert_called_once()
+        mock_run.assert_called_once()
+
+
+class TestTableNameValidation:
+    """Test table name validation."""
+
+    @pytest.mark.parametrize("name", ["users", "_tmp", "$log", "Order_Items2"])
+    def test_valid_table_names(self, name):
+        """Test that valid MySQL identifiers are accepted."""
+        assert validate_table_name(name)
+
+    @pytest.mark.parametrize("name", [
+        "",
+        "1users",
+        "users;drop",
+        "user-name",
+        "users`",
+        "users\n",
+        "tabl\u00e9",
+        "a" * 65,
+    ])
+    def test_invalid_table_names(self, name):
+        """Test that unsafe or malformed names are rejected."""
+        assert not validate_table_name(name)
+
+
+class TestTableExists:
+    """Test the table existence check."""
+
+    @pytest.mark.parametrize("rows, expected", [([(1,)], True), ([], False)])
+    @patch("mysql_mcp.server.connect")
+    def test_table_exists(self, mock_connect, rows, expected):
+        """Test that existence is checked with an exact, parameterized match."""
+        mock_cursor = (
+            mock_connect.return_value.__enter__.return_value
+            .cursor.return_value.__enter__.return_value
+        )
+        mock_cursor.fetchall.return_value = rows
+
+        assert table_exists("order_items", {"user": "test_user"}) is expected
+
+        query, params = mock_cursor.execute.call_args.args
+        assert "TABLE_NAME = %s" in query
+        assert params == ("order_items",)
+
+    @patch("mysql_mcp.server.connect")
+    def test_table_exists_connection_error(self, mock_connect):
+        """Test that connection errors are reported as a missing table."""
+        mock_connect.side_effect = Error("Access denied")
+
+        assert table_exists("users", {"user": "test_user"}) is False
+
 
 class TestMCPIntegration:
     """Test FastMCP integration functionality."""
@@ -113,6 +286,9 @@ class TestMCPIntegration:
             assert execute_tool.description is not None
             assert "query" in str(execute_tool.inputSchema)
 
+            # Results are sent once, as text, not duplicated as structured output
+            assert execute_tool.outputSchema is None
+
     @pytest.mark.asyncio
     async def test_mcp_server_resources(self):
         """Test that MCP server exposes the correct resources."""
@@ -124,22 +300,13 @@ class TestMCPIntegration:
             assert "mysql://tables" in resource_uris
 
     @pytest.mark.asyncio
-    @patch("mysql_mcp.server.connect")
-    async def test_execute_sql_via_mcp(self, mock_connect):
+    async def test_execute_sql_via_mcp(self, db_config, mock_mysql_connection):
         """Test executing SQL via MCP client."""
-        # Setup database configuration
-        setup_test_db_config()
-
-        # Setup mock
-        mock_cursor = MagicMock()
-        mock_connection = MagicMock()
-        mock_connect.return_value.__enter__.return_value = mock_connection
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_connection.get_server_info.return_value = "8.0.33"
+        _, mock_cursor = mock_mysql_connection
 
         # Setup mock for SELECT query
         mock_cursor.description = [("count",)]
-        mock_cursor.fetchall.return_value = [(5,)]
+        mock_cursor.fetchmany.side_effect = [[(5,)], []]
 
         # Call the tool via MCP
         async with Client(mcp) as client:
@@ -148,26 +315,20 @@ class TestMCPIntegration:
             })
 
             # Verify the result
-            assert "count" in result.data
-            assert "5" in result.data
+            assert "count" in result.content[0].text
+            assert "5" in result.content[0].text
+            assert result.structured_content is None
 
     @pytest.mark.asyncio
-    @patch("mysql_mcp.server.connect")
-    async def test_execute_sql_show_tables_via_mcp(self, mock_connect):
+    async def test_execute_sql_show_tables_via_mcp(
+        self, db_config, mock_mysql_connection
+    ):
         """Test SHOW TABLES via MCP client."""
-        # Setup database configuration
-        setup_test_db_config()
-
-        # Setup mock
-        mock_cursor = MagicMock()
-        mock_connection = MagicMock()
-        mock_connect.return_value.__enter__.return_value = mock_connection
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_connection.get_server_info.return_value = "8.0.33"
+        _, mock_cursor = mock_mysql_connection
 
         # Setup mock for SHOW TABLES
         mock_cursor.description = [("Tables_in_test_db",)]
-        mock_cursor.fetchall.return_value = [("users",), ("products",)]
+        mock_cursor.fetchmany.side_effect = [[("users",), ("products",)], []]
 
         # Call the tool via MCP
         async with Client(mcp) as client:
@@ -176,26 +337,72 @@ class TestMCPIntegration:
             })
 
             # Verify the result includes header and tables
-            lines = result.data.split("\n")
+            lines = result.content[0].text.split("\n")
             assert lines[0] == "Tables_in_test_db"
             assert "users" in lines[1]
             assert "products" in lines[2]
 
     @pytest.mark.asyncio
-    @patch("mysql_mcp.server.connect")
-    async def test_list_tables_via_mcp(self, mock_connect):
-        """Test listing tables via MCP resources."""
-        # Setup database configuration
-        setup_test_db_config()
+    async def test_execute_sql_csv_quoting_via_mcp(
+        self, db_config, mock_mysql_connection
+    ):
+        """Test that values containing delimiters are quoted in the output."""
+        _, mock_cursor = mock_mysql_connection
+
+        mock_cursor.description = [("id",), ("note",)]
+        mock_cursor.fetchmany.side_effect = [[(1, "a,b"), (2, 'say "hi"\nbye')], []]
+
+        async with Client(mcp) as client:
+            result = await client.call_tool("execute_sql", {
+                "query": "SELECT id, note FROM notes"
+            })
+
+            assert result.content[0].text == 'id,note\n1,"a,b"\n2,"say ""hi""\nbye"\n'
+
+    @pytest.mark.asyncio
+    async def test_execute_sql_max_rows_via_mcp(
+        self, db_config, mock_mysql_connection
+    ):
+        """Test that results beyond --max-rows are truncated."""
+        mock_connection, mock_cursor = mock_mysql_connection
+
+        mock_cursor.description = [("id",)]
+        mock_cursor.fetchmany.side_effect = [[(1,), (2,), (3,)], []]
 
-        # Setup mock
-        mock_cursor = MagicMock()
-        mock_connection = MagicMock()
-        mock_connect.return_value.__enter__.return_value = mock_connection
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_connection.get_server_info.return_value = "8.0.33"
+        with patch.object(server_module, "_max_rows", 2):
+            async with Client(mcp) as client:
+                result = await client.call_tool("execute_sql", {
+                    "query": "SELECT id FROM users"
+                })
+
+        assert result.content[0].text == "id\n1\n2\n... truncated to 2 rows\n"
+        mock_connection.consume_results.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_execute_sql_runs_off_event_loop(
+        self, db_config, mock_mysql_connection
+    ):
+        """Test that blocking database work runs in a worker thread."""
+        _, mock_cursor = mock_mysql_connection
+        query_threads = []
+        mock_cursor.execute.side_effect = (
+            lambda query: query_threads.append(threading.current_thread())
+        )
+        mock_cursor.description = None
+        mock_cursor.rowcount = 0
+
+        async with Client(mcp) as client:
+            await client.call_tool("execute_sql", {"query": "DO 1"})
+
+        assert query_threads
+        assert query_threads[0] is not threading.main_thread()
+
+    @pytest.mark.asyncio
+    async def test_list_tables_via_mcp(self, db_config, mock_mysql_connection):
+        """Test listing tables via MCP resources."""
+        _, mock_cursor = mock_mysql_connection
 
-        mock_cursor.fetchall.return_value = [("users",), ("products",)]
+        mock_cursor.fetchall.return_value = [("- products",), ("- users",)]
 
         # Read the tables resource
         async with Client(mcp) as client:
@@ -207,33 +414,18 @@ class TestMCPIntegration:
                 content = resource.text
             else:
                 content = resource.blob  # type: ignore
-            assert "Available tables:" in content
-            assert "- users" in content
-            assert "- products" in content
+            assert content == "Available tables:\n- products\n- users"
 
     @pytest.mark.asyncio
-    @patch("mysql_mcp.server.connect")
-    async def test_describe_table_via_mcp(self, mock_connect):
+    async def test_describe_table_via_mcp(self, db_config, mock_mysql_connection):
         """Test describing a table via MCP resources."""
-        # Setup database configuration
-        setup_test_db_config()
-
-        # Setup mock
-        mock_cursor = MagicMock()
-        mock_connection = MagicMock()
-        mock_connect.return_value.__enter__.return_value = mock_connection
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_connection.get_server_info.return_value = "8.0.33"
-
-        # Mock DESCRIBE and COUNT queries
-        describe_result = [
-            ("id", "int(11)", "NO", "PRI", None, "auto_increment"),
-            ("name", "varchar(255)", "NO", "", None, ""),
-        ]
-        count_result = [(50,)]
+        _, mock_cursor = mock_mysql_connection
 
-        mock_cursor.fetchall.return_value = describe_result
-        mock_cursor.fetchone.return_value = count_result[0]
+        # Mock the information_schema columns query
+        mock_cursor.fetchall.return_value = [
+            ("id", "int(11)", "NO", "PRI", None, "auto_increment", 50),
+            ("name", "varchar(255)", "NO", "", None, "", 50),
+        ]
 
         # Read the table description resource
         async with Client(mcp) as client:
@@ -246,8 +438,150 @@ class TestMCPIntegration:
             else:
                 content = resource.blob  # type: ignore
             assert "Table: users" in content
-            assert "id: int(11)" in content
-            assert "Total rows: 50" in content
+            assert "  - id: int(11) NOT NULL (PRI) auto_increment\n" in content
+            assert "  - name: varchar(255) NOT NULL\n" in content
+            assert "Approximate rows: 50" in content
+
+            # Structure and row count come from one parameterized query
+            mock_cursor.execute.assert_called_once()
+            assert mock_cursor.execute.call_args.args[1] == ("users",)
+
+    @pytest.mark.asyncio
+    async def test_describe_missing_table_via_mcp(
+        self, db_config, mock_mysql_connection
+    ):
+        """Test describing a table that does not exist."""
+        _, mock_cursor = mock_mysql_connection
+
+        mock_cursor.fetchall.return_value = []
+
+        async with Client(mcp) as client:
+            result = await client.read_resource("mysql://tables/missing")
+
+            resource = result[0]
+            if isinstance(resource, TextResourceContents):
+                content = resource.text
+            else:
+                content = resource.blob  # type: ignore
+            assert "Table 'missing' not found in the database." in content
+
+
+class TestSchemaCache:
+    """Test caching of schema resource responses."""
+
+    @pytest.mark.asyncio
+    async def test_list_tables_served_from_cache(
+        self, db_config, mock_pool, mock_mysql_connection
+    ):
+        """Test that repeated table listings do not hit the database."""
+        _, mock_cursor = mock_mysql_connection
+
+        mock_cursor.fetchall.return_value = [("- users",)]
+
+        async with Client(mcp) as client:
+            first = await client.read_resource("mysql://tables")
+            second = await client.read_resource("mysql://tables")
+
+        assert first == second
+        mock_pool.get_connection.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_write_query_clears_cache(self, db_config, mock_mysql_connection):
+        """Test that statements without a result set invalidate the cache."""
+        generation = server_module.get_schema_cache_generation()
+        server_module.cache_schema(
+            "mysql://tables", "Available tables:\n- users", generation
+        )
+        _, mock_cursor = mock_mysql_connection
+
+        mock_cursor.description = None
+        mock_cursor.rowcount = 0
+
+        async with Client(mcp) as client:
+            await client.call_tool("execute_sql", {"query": "DROP TABLE users"})
+
+        assert server_module.get_cached_schema("mysql://tables") is None
+
+    def test_cache_entries_expire(self):
+        """Test that cached responses expire after the TTL."""
+        server_module.clear_schema_cache()
+
+        with patch("mysql_mcp.server.time.monotonic", return_value=100.0):
+            generation = server_module.get_schema_cache_generation()
+            server_module.cache_schema("mysql://tables", "cached", generation)
+            assert server_module.get_cached_schema("mysql://tables") == "cached"
+
+        expired = 100.0 + server_module._schema_cache_ttl
+        with patch("mysql_mcp.server.time.monotonic", return_value=expired):
+            assert server_module.get_cached_schema("mysql://tables") is None
+
+    def test_stale_response_not_cached_after_clear(self):
+        """Test that a query started before a clear does not store its result."""
+        server_module.clear_schema_cache()
+        generation = server_module.get_schema_cache_generation()
+
+        # A DDL statement invalidates the cache while the query is in flight
+        server_module.clear_schema_cache()
+        server_module.cache_schema("mysql://tables", "stale", generation)
+
+        assert server_module.get_cached_schema("mysql://tables") is None
+
+    @pytest.mark.asyncio
+    async def test_zero_ttl_disables_cache(
+        self, db_config, mock_pool, mock_mysql_connection
+    ):
+        """Test that a TTL of 0 sends every read to the database."""
+        _, mock_cursor = mock_mysql_connection
+        mock_cursor.fetchall.return_value = [("- users",)]
+
+        with patch.object(server_module, "_schema_cache_ttl", 0):
+            async with Client(mcp) as client:
+                await client.read_resource("mysql://tables")
+                await client.read_resource("mysql://tables")
+
+        assert mock_pool.get_connection.call_count == 2
+        assert server_module.get_cached_schema("mysql://tables") is None
+
+
+class TestConcurrency:
+    """Test limiting concurrent database calls to the pool size."""
+
+    @pytest.mark.asyncio
+    async def test_cancelled_call_keeps_slot_until_thread_finishes(self):
+        """Test that cancelling a call does not free its slot early."""
+        connections = threading.Semaphore(1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def checkout(wait: bool) -> str:
+            if not connections.acquire(blocking=False):
+                return "pool exhausted"
+            try:
+                started.set()
+                if wait:
+                    release.wait(5)
+                return "ok"
+            finally:
+                connections.release()
+
+        with (
+            patch.object(server_module, "_pool_size", 1),
+            patch.object(server_module, "_db_semaphore", None),
+        ):
+            first = asyncio.create_task(server_module.run_in_db_thread(checkout, True))
+            await asyncio.to_thread(started.wait, 5)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+
+            second = asyncio.create_task(
+                server_module.run_in_db_thread(checkout, False)
+            )
+            await asyncio.sleep(0.05)
+            assert not second.done()
+
+            release.set()
+            assert await second == "ok"
 
 
 class TestErrorHandling:
@@ -269,28 +603,32 @@ class TestErrorHandling:
             server_module._db_config = original_config
 
     @pytest.mark.asyncio
-    @patch("mysql_mcp.server.connect")
-    async def test_mcp_tool_error_handling(self, mock_connect):
+    async def test_mcp_tool_error_handling(self, db_config, mock_pool):
         """Test error handling in MCP tools."""
-        # Setup database configuration
-        setup_test_db_config()
-
-        mock_connect.side_effect = Error("Connection timeout")
+        mock_pool.get_connection.side_effect = Error("Connection timeout")
 
         # This should not raise an exception, but return an error message
         async with Client(mcp) as client:
             result = await client.call_tool("execute_sql", {"query": "SELECT 1"})
 
-            assert "MySQL error" in result.data
+            assert "MySQL error" in result.content[0].text
 
     @pytest.mark.asyncio
-    @patch("mysql_mcp.server.connect")
-    async def test_mcp_resource_error_handling(self, mock_connect):
-        """Test error handling in MCP resources."""
-        # Setup database configuration
-        setup_test_db_config()
+    async def test_mcp_tool_unexpected_error_logged(self, db_config, mock_pool, caplog):
+        """Test that unexpected errors are logged and not echoed to the client."""
+        mock_pool.get_connection.side_effect = RuntimeError("internal detail")
 
-        mock_connect.side_effect = Error("Access denied")
+        async with Client(mcp) as client:
+            result = await client.call_tool("execute_sql", {"query": "SELECT 1"})
+
+        assert result.content[0].text == server_module.UNEXPECTED_ERROR_MESSAGE
+        assert "Unexpected error in execute_sql" in caplog.text
+        assert "internal detail" in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_mcp_resource_error_handling(self, db_config, mock_pool):
+        """Test error handling in MCP resources."""
+        mock_pool.get_connection.side_effect = Error("Access denied")
 
         # This should not raise an exception, but return an error message
         async with Client(mcp) as client:
@@ -304,18 +642,9 @@ class TestErrorHandling:
             assert "MySQL error" in content
 
     @pytest.mark.asyncio
-    @patch("mysql_mcp.server.connect")
-    async def test_insert_query_via_mcp(self, mock_connect):
+    async def test_insert_query_via_mcp(self, db_config, mock_mysql_connection):
         """Test INSERT query via MCP client."""
-        # Setup database configuration
-        setup_test_db_config()
-
-        # Setup mock
-        mock_cursor = MagicMock()
-        mock_connection = MagicMock()
-        mock_connect.return_value.__enter__.return_value = mock_connection
-        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor
-        mock_connection.get_server_info.return_value = "8.0.33"
+        mock_connection, mock_cursor = mock_mysql_connection
 
         # Setup mock for INSERT query (no description = non-SELECT)
         mock_cursor.description = None
@@ -331,7 +660,8 @@ class TestErrorHandling:
             })
 
             # Verify the result message
-            assert "Query executed successfully. 1 rows affected." in result.data
+            content = result.content[0].text
+            assert "Query executed successfully. 1 rows affected." in content
 
             # Verify the connection was committed
             mock_connection.commit.assert_called_once()